@@ -0,0 +1,41 @@
+import fitz
+import pytest
+
+# Redaction boxes drawn on every page of the generated PDF, in points
+BOXES = [
+    fitz.Rect(72, 200, 172, 215),
+    fitz.Rect(72, 300, 172, 315),
+    fitz.Rect(300, 400, 400, 440),
+]
+
+# Text drawn under the first box, recoverable from the text layer
+HIDDEN_TEXT = "Alice Smith"
+
+
+@pytest.fixture
+def redaction_boxes():
+    """The rectangles blacked out on each page of `redacted_pdf`."""
+    return list(BOXES)
+
+
+@pytest.fixture
+def hidden_text():
+    """The text covered by the first box on each page of `redacted_pdf`."""
+    return HIDDEN_TEXT
+
+
+@pytest.fixture
+def redacted_pdf(tmp_path):
+    """A two-page text PDF with three black boxes on each page, the first over HIDDEN_TEXT."""
+    path = tmp_path / "redacted.pdf"
+    doc = fitz.open()
+    for _ in range(2):
+        page = doc.new_page(width=612, height=792)
+        for line in range(6):
+            page.insert_text((72, 60 + 14 * line), "Quarterly report prepared for the review board", fontsize=12)
+        page.insert_text((74, 212), HIDDEN_TEXT, fontsize=11)
+        for rect in BOXES:
+            page.draw_rect(rect, color=(0, 0, 0), fill=(0, 0, 0))
+    doc.save(path)
+    doc.close()
+    return str(path)
@@ -0,0 +1,55 @@
+import base64
+import io
+import os
+
+import pytest
+
+from unredactor_mcp import server
+
+
+@pytest.fixture(autouse=True)
+def small_slices(monkeypatch):
+    # Slices of a few characters put every boundary case inside short inputs
+    monkeypatch.setattr(server, "_B64_CHUNK_BYTES", 6)
+
+
+def _decode(data):
+    f = io.BytesIO()
+    server._b64decode_to_file(data, f)
+    return f.getvalue()
+
+
+def _messy(encoded):
+    # Sprinkle characters b64decode ignores: whitespace, control, URL-safe
+    junk = ["\n", " ", "\x00", "-", "_", "\t", "*", "\x7f"]
+    return "".join(ch + junk[i % len(junk)] for i, ch in enumerate(encoded))
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 5, 17, 64, 1000])
+def test_decode_matches_stdlib_on_messy_input(size):
+    data = os.urandom(size)
+    text = _messy(base64.b64encode(data).decode("ascii"))
+    assert _decode(text) == base64.b64decode(text) == data
+
+
+@pytest.mark.parametrize("text", ["QQ==QUJD", "QUJD=QUJDRA==", "QUJD\n\nQQ==junk", "QUJDRE=="])
+def test_decode_matches_stdlib_on_interior_padding(text):
+    assert _decode(text) == base64.b64decode(text)
+
+
+@pytest.mark.parametrize("text", ["QUJDRA", "QUJDR", "QQ="])
+def test_decode_rejects_truncated_input_like_stdlib(text):
+    with pytest.raises(ValueError):
+        base64.b64decode(text)
+    with pytest.raises(ValueError):
+        _decode(text)
+
+
+@pytest.mark.parametrize("size", [0, 1, 6, 7, 100])
+def test_encode_file_round_trip(tmp_path, size):
+    data = os.urandom(size)
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    encoded = server._b64encode_file(str(path))
+    assert encoded == base64.b64encode(data).decode("ascii")
+    assert _decode(encoded) == data
@@ -0,0 +1,57 @@
+import os
+import shutil
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+from unredactor_mcp import server
+
+
+def test_forked_child_can_open_documents_while_parent_holds_lock(redacted_pdf):
+    with server._doc_cache_lock:
+        pid = os.fork()
+        if pid == 0:
+            # An inherited, held lock would hang here; the alarm kills the child
+            signal.alarm(10)
+            try:
+                server._open_cached(redacted_pdf)
+            except BaseException:
+                os._exit(1)
+            os._exit(0)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_open_cached_releases_deleted_files(redacted_pdf, tmp_path):
+    scratch = str(tmp_path / "scratch.pdf")
+    shutil.copy(redacted_pdf, scratch)
+    server._open_cached(scratch)
+    assert any(path == scratch for _, path in server._doc_cache)
+
+    os.unlink(scratch)
+    server._open_cached(redacted_pdf)
+    assert not any(path == scratch for _, path in server._doc_cache)
+
+
+def test_open_cached_gives_each_thread_its_own_document(redacted_pdf):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        other = executor.submit(server._open_cached, redacted_pdf).result()
+    doc = server._open_cached(redacted_pdf)
+
+    assert doc is server._open_cached(redacted_pdf)
+    assert doc is not other
+
+    server._close_cached(redacted_pdf)
+    assert doc.is_closed
+    assert not other.is_closed
+    assert not any(path == redacted_pdf for _, path in server._doc_cache)
+
+
+def test_scratch_buffers_are_capped(monkeypatch):
+    monkeypatch.setattr(server, "_SCRATCH_MAX_PIXELS", 100)
+    server._scratch("capped", (10, 10))
+    buf = server._scratch_buffers.capped
+    assert server._scratch("capped", (5, 10)).base is buf
+
+    large = server._scratch("capped", (20, 20))
+    assert large.shape == (20, 20)
+    assert server._scratch_buffers.capped is buf
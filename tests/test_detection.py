@@ -0,0 +1,32 @@
+from unredactor_mcp import server
+
+
+def test_find_boxes_in_pdf(redacted_pdf, redaction_boxes):
+    boxes = server.find_boxes_in_pdf(redacted_pdf, page_num=0)
+
+    found = sorted((b["x0"], b["y0"], b["x1"], b["y1"]) for b in boxes)
+    expected = sorted(tuple(rect) for rect in redaction_boxes)
+    assert len(found) == len(expected)
+    for got, want in zip(found, expected):
+        assert all(abs(g - w) <= 1.0 for g, w in zip(got, want))
+    assert all(b["page"] == 0 for b in boxes)
+
+
+def test_detection_survives_store_trim(redacted_pdf, redaction_boxes):
+    # Render past the MuPDF store trim interval so the trim path runs
+    for _ in range(server._MUPDF_STORE_TRIM_EVERY + 1):
+        assert len(server.find_boxes_in_pdf(redacted_pdf, page_num=1)) == len(redaction_boxes)
+
+
+def test_parallel_detection_matches_serial(redacted_pdf, monkeypatch):
+    # Take the pool path even on a single-CPU machine
+    monkeypatch.setattr(server, "DEFAULT_WORKERS", 2)
+    serial = server._detect_pages(redacted_pdf, range(2))
+    server._forget_detections(redacted_pdf)
+    parallel = server._detect_pages(redacted_pdf, range(2), parallel=True)
+
+    for s_arrays, p_arrays in zip(serial, parallel):
+        assert s_arrays.keys() == p_arrays.keys()
+        for key in s_arrays:
+            assert (s_arrays[key] == p_arrays[key]).all()
+    assert server._get_pool() is server._get_pool()
@@ -0,0 +1,62 @@
+import asyncio
+import os
+
+import pytest
+
+from unredactor_mcp import server
+
+
+@pytest.mark.parametrize("pdf_data", [None, "JVBERi0x", "not base64 at all!"])
+def test_replace_bad_input_leaves_no_scratch_files(pdf_data):
+    before = set(os.listdir(server.SCRATCH_DIR))
+    with pytest.raises(Exception):
+        server._http_replace_redaction_boxes({
+            "pdf_data": pdf_data,
+            "box_width": 100,
+            "box_height": 15,
+            "replacement_text": "Alice",
+        })
+    assert set(os.listdir(server.SCRATCH_DIR)) == before
+
+
+def _run_response(response, headers):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": headers,
+        "extensions": {"http.response.zerocopysend": {}},
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopysend":
+            message = dict(message, body=message["file"].read())
+        messages.append(message)
+
+    asyncio.run(response(scope, receive, send))
+    return messages
+
+
+def test_zero_copy_response_sends_file_object(tmp_path):
+    path = tmp_path / "out.pdf"
+    path.write_bytes(b"%PDF-1.7 body")
+
+    messages = _run_response(server.ZeroCopyFileResponse(str(path)), [])
+
+    assert messages[0]["status"] == 200
+    assert messages[1]["type"] == "http.response.zerocopysend"
+    assert messages[1]["body"] == b"%PDF-1.7 body"
+
+
+def test_zero_copy_response_honours_range(tmp_path):
+    path = tmp_path / "out.pdf"
+    path.write_bytes(b"%PDF-1.7 body")
+
+    messages = _run_response(server.ZeroCopyFileResponse(str(path)), [(b"range", b"bytes=0-3")])
+
+    assert messages[0]["status"] == 206
+    assert b"".join(m.get("body", b"") for m in messages[1:]) == b"%PDF"
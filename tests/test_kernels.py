@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+import pytest
+
+from unredactor_mcp import server
+
+pytest.importorskip("numba")
+
+
+@pytest.fixture
+def gray():
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, size=(97, 131), dtype=np.uint8)
+    img[10:30, 20:90] = 0
+    img[50:60, 5:40] = 50
+    return img
+
+
+def test_threshold_black_matches_cv2(gray):
+    out = np.empty_like(gray)
+    server._threshold_black(gray, 50, out)
+
+    _, expected = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
+    assert (out == expected).all()
+
+
+def test_filter_box_stats_matches_numpy(gray):
+    _, mask = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=4, ltype=cv2.CV_32S)
+    stats = stats[1:]
+
+    got = server._filter_box_stats(stats, 3, 2, 120, 90)
+    expected = server._filter_box_stats_numpy(stats, 3, 2, 120, 90)
+    assert got.dtype == expected.dtype == np.int32
+    assert (got == expected).all()
+    assert len(got)
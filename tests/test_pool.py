@@ -0,0 +1,17 @@
+import os
+
+from unredactor_mcp import server
+
+
+def _worker_threading():
+    return server._ocr_workers, os.environ.get("OMP_THREAD_LIMIT")
+
+
+def test_pool_workers_run_tesseract_single_threaded():
+    assert server._get_pool().submit(_worker_threading).result() == (1, "1")
+    assert server._ocr_workers == server.OCR_WORKERS
+
+
+def test_pool_workers_are_not_forked_from_the_server():
+    assert server._POOL_CONTEXT.get_start_method() in ("forkserver", "spawn")
+    assert server._get_pool().submit(os.getppid).result() != os.getpid()
@@ -0,0 +1,143 @@
+import asyncio
+import base64
+from pathlib import Path
+
+import fitz
+import pytest
+
+from unredactor_mcp import server
+
+
+@pytest.fixture
+def file_id(redacted_pdf):
+    encoded = base64.b64encode(Path(redacted_pdf).read_bytes()).decode("ascii")
+    uploaded = server.upload_pdf(encoded, filename="redacted.pdf")
+    yield uploaded["file_id"]
+    if uploaded["file_id"] in server.uploaded_files:
+        server.cleanup_file(uploaded["file_id"])
+
+
+def test_upload_rejects_non_pdf():
+    with pytest.raises(ValueError):
+        server.upload_pdf(base64.b64encode(b"not a pdf" * 20).decode("ascii"))
+
+
+def test_detect_black_boxes(file_id, redaction_boxes):
+    result = server.detect_black_boxes(file_id, page_number=0)
+
+    assert result["total_boxes_found"] == len(redaction_boxes)
+    assert result["pdf_type"]["is_text_based"]
+    sizes = {(group["width"], group["height"]): group["count"] for group in result["boxes_by_size"]}
+    assert sizes == {(100.0, 15.0): 2, (100.0, 40.0): 1}
+
+
+def test_detect_all_pages(file_id, redaction_boxes):
+    result = asyncio.run(server.detect_all_pages(file_id))
+
+    assert result["page_count"] == 2
+    assert result["total_boxes"] == 2 * len(redaction_boxes)
+    assert [page["boxes_found"] for page in result["pages"]] == [len(redaction_boxes)] * 2
+
+
+def test_replace_recovers_hidden_text(file_id, hidden_text):
+    result = asyncio.run(server.replace_redaction_boxes(file_id, 100, 15, "REPLACED"))
+    try:
+        assert hidden_text in [item["text"] for item in result["discovered_text"]]
+        assert result["unredacted_count"] >= 2
+    finally:
+        server.cleanup_file(result["modified_file_id"])
+
+
+def test_replace_reads_text_layer_without_pool(file_id, hidden_text, monkeypatch):
+    pooled = []
+
+    def record_pool_map(fn, *iterables):
+        pooled.append(getattr(fn, "func", fn))
+        return map(fn, *iterables)
+
+    monkeypatch.setattr(server, "DEFAULT_WORKERS", 2)
+    monkeypatch.setattr(server, "_pool_map", record_pool_map)
+    result = asyncio.run(server.replace_redaction_boxes(file_id, 100, 15, "REPLACED"))
+    try:
+        assert hidden_text in [item["text"] for item in result["discovered_text"]]
+        assert server._hidden_text_worker not in pooled
+    finally:
+        server.cleanup_file(result["modified_file_id"])
+
+
+def test_replace_covers_matching_boxes(file_id):
+    result = asyncio.run(server.replace_redaction_boxes(file_id, 100, 15, "REPLACED"))
+    modified_id = result["modified_file_id"]
+    try:
+        assert result["total_boxes_replaced"] == 4
+        assert result["pages_modified"] == [0, 1]
+
+        # Only the box of the other size is still black
+        doc = fitz.open(server.uploaded_files[modified_id])
+        for page in doc:
+            assert "REPLACED" in page.get_text()
+            assert len(server.find_boxes_in_pdf(None, page.number, doc=doc)) == 1
+        doc.close()
+    finally:
+        server.cleanup_file(modified_id)
+
+
+@pytest.fixture
+def rotated_file_id(redacted_pdf):
+    doc = fitz.open(redacted_pdf)
+    for page in doc:
+        page.set_rotation(90)
+    uploaded = server.upload_pdf(base64.b64encode(doc.tobytes()).decode("ascii"))
+    doc.close()
+    yield uploaded["file_id"]
+    server.cleanup_file(uploaded["file_id"])
+
+
+def test_replace_on_rotated_page(rotated_file_id, hidden_text):
+    # On a /Rotate 90 page the 100x15 boxes show up as 15x100
+    result = asyncio.run(server.replace_redaction_boxes(rotated_file_id, 15, 100, "REPLACED"))
+    modified_id = result["modified_file_id"]
+    try:
+        assert result["total_boxes_replaced"] == 4
+        assert hidden_text in [item["text"] for item in result["discovered_text"]]
+
+        doc = fitz.open(server.uploaded_files[modified_id])
+        for page in doc:
+            boxes = server.find_boxes_in_pdf(None, page.number, doc=doc)
+            assert [(box["width"], box["height"]) for box in boxes] == [(40.0, 100.0)]
+
+            # The replacement text reads left to right on the rotated page
+            lines = [
+                line for block in page.get_text("dict")["blocks"] for line in block.get("lines", [])
+                if "REPLACED" in "".join(span["text"] for span in line["spans"])
+            ]
+            assert len(lines) == 2
+            m = page.rotation_matrix
+            for line in lines:
+                dx, dy = line["dir"]
+                assert (round(dx * m.a + dy * m.c), round(dx * m.b + dy * m.d)) == (1, 0)
+        doc.close()
+    finally:
+        server.cleanup_file(modified_id)
+
+def test_download_pdf_reuses_encoding(file_id):
+    path = server.uploaded_files[file_id]
+    download = server.download_pdf(file_id)
+
+    assert base64.b64decode(download["pdf_base64"]) == Path(path).read_bytes()
+    assert download["size_bytes"] == Path(path).stat().st_size
+    assert server.download_pdf(file_id)["pdf_base64"] is download["pdf_base64"]
+    assert not server.download_pdf(file_id, include_base64=False).get("pdf_base64")
+
+    server.cleanup_file(file_id)
+    assert not any(key[0] == path for key in server._encoded_cache)
+
+
+def test_cleanup_file(file_id):
+    path = server.uploaded_files[file_id]
+    server.cleanup_file(file_id)
+
+    assert file_id not in server.uploaded_files
+    assert not Path(path).exists()
+    with pytest.raises(ValueError):
+        server.download_pdf(file_id)
@@ -7,13 +7,26 @@ Requirements:
 """
 
 import fitz  # PyMuPDF
-from PIL import Image, ImageTk, ImageDraw
+from PIL import Image, ImageTk, ImageDraw, ImageFont
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 import io
+from functools import lru_cache
 import cv2
 import numpy as np
 
+
+@lru_cache(maxsize=64)
+def get_font(font_size):
+    """Load the replacement-text font once per size"""
+    for font_name in ("DejaVuSans.ttf", "arial.ttf"):
+        try:
+            return ImageFont.truetype(font_name, font_size)
+        except OSError:
+            pass
+    return ImageFont.load_default()
+
+
 class PDFBoxReplacer:
     def __init__(self, root):
         self.root = root
@@ -276,14 +289,15 @@ class PDFBoxReplacer:
         
         # Render page to image at high resolution
         mat = fitz.Matrix(2, 2)
-        pix = page.get_pixmap(matrix=mat)
+        pix = page.get_pixmap(matrix=mat, alpha=False)
         
-        # Convert to PIL Image
-        img_data = pix.tobytes("png")
-        img = Image.open(io.BytesIO(img_data))
+        # Convert to PIL Image straight from the raw RGB samples
+        img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
         draw = ImageDraw.Draw(img)
         
         count = 0
+        # The text is the same for every box, so measure it once per font size
+        text_sizes = {}
         # Find matching boxes and draw white rectangles with text
         for box in self.all_boxes:
             width = box["width"]
@@ -305,17 +319,13 @@ class PDFBoxReplacer:
                 
                 # Add text
                 font_size = int(min(height * 0.6, 12) * 2)  # Scale font size too
-                try:
-                    from PIL import ImageFont
-                    # Try to use a default font
-                    font = ImageFont.truetype("arial.ttf", font_size)
-                except:
-                    font = ImageFont.load_default()
+                font = get_font(font_size)
                 
                 # Center the text
-                bbox = draw.textbbox((0, 0), text, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
+                if font_size not in text_sizes:
+                    bbox = draw.textbbox((0, 0), text, font=font)
+                    text_sizes[font_size] = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+                text_width, text_height = text_sizes[font_size]
                 text_x = x0 + (x1 - x0 - text_width) / 2
                 text_y = y0 + (y1 - y0 - text_height) / 2
                 
@@ -323,19 +333,14 @@ class PDFBoxReplacer:
                 count += 1
         
         if count > 0:
-            # Convert back to bytes
-            img_bytes = io.BytesIO()
-            img.save(img_bytes, format='PNG')
-            img_bytes.seek(0)
-            
-            # Replace the page with the modified image
-            img_pdf = fitz.open("png", img_bytes.read())
-            pdf_bytes = img_pdf.convert_to_pdf()
-            img_pdf.close()
+            # Wrap the raw RGB samples in a pixmap, no PNG encode/decode
+            new_pix = fitz.Pixmap(fitz.csRGB, img.width, img.height, img.tobytes(), False)
             
-            # Replace the current page
+            # Replace the current page with one holding the modified image
+            page_rect = page.rect
             self.pdf_doc.delete_page(self.current_page)
-            self.pdf_doc.insert_pdf(fitz.open("pdf", pdf_bytes), from_page=0, to_page=0, start_at=self.current_page)
+            new_page = self.pdf_doc.new_page(self.current_page, width=page_rect.width, height=page_rect.height)
+            new_page.insert_image(new_page.rect, pixmap=new_pix)
         
         return count
     
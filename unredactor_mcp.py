@@ -9,11 +9,8 @@ Or add to Claude Code's MCP config.
 """
 
 import fitz  # PyMuPDF
-from PIL import Image, ImageDraw, ImageFont
 import cv2
 import numpy as np
-import io
-import base64
 import os
 from typing import Any
 
@@ -22,6 +19,53 @@ from mcp.server.fastmcp import FastMCP
 # Create the MCP server
 mcp = FastMCP("unredactor")
 
+# Smallest box considered a redaction, in PDF points
+MIN_BOX_WIDTH = 10
+MIN_BOX_HEIGHT = 5
+
+
+def _find_boxes_in_page(page) -> list[dict]:
+    """Find all black rectangles on an open PDF page."""
+    page_num = page.number
+
+    # Render at native resolution; redaction boxes are far larger than a pixel,
+    # so a higher scale only multiplies the pixels every pass has to touch
+    pix = page.get_pixmap(alpha=False)
+
+    # View the raw RGB samples in place as an OpenCV image (pix stays alive below)
+    img = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, 3)
+
+    # Mask near-black pixels in a single pass over all channels (no grayscale conversion)
+    mask = cv2.inRange(img, (0, 0, 0), (50, 50, 50))
+
+    # Label connected black regions; each stats row is a bounding box (row 0 is background).
+    # Boxes are solid rectangles, so 4-connectivity finds them whole
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=4, ltype=cv2.CV_32S)
+
+    # Filter out very small or very large boxes in one vectorized pass
+    stats = stats[1:]
+    w = stats[:, cv2.CC_STAT_WIDTH]
+    h = stats[:, cv2.CC_STAT_HEIGHT]
+    keep = ((w > MIN_BOX_WIDTH) & (h > MIN_BOX_HEIGHT)
+            & (w < pix.width * 0.8) & (h < pix.height * 0.8))
+
+    # At 1x, pixel coordinates are PDF coordinates; report them as floats,
+    # as the package server does
+    boxes = [
+        {
+            "x0": x,
+            "y0": y,
+            "x1": x + bw,
+            "y1": y + bh,
+            "width": bw,
+            "height": bh,
+            "page": page_num
+        }
+        for x, y, bw, bh in stats[keep, :4].astype(np.float64).tolist()
+    ]
+
+    return boxes
+
 
 def find_boxes_in_pdf(pdf_path: str, page_num: int = 0) -> list[dict]:
     """Find all black rectangles on a PDF page using image processing."""
@@ -31,47 +75,7 @@ def find_boxes_in_pdf(pdf_path: str, page_num: int = 0) -> list[dict]:
         doc.close()
         raise ValueError(f"Page {page_num} does not exist. PDF has {len(doc)} pages.")
 
-    page = doc[page_num]
-    boxes = []
-
-    # Render page to image at 2x for better detection
-    mat = fitz.Matrix(2, 2)
-    pix = page.get_pixmap(matrix=mat)
-    img_data = pix.tobytes("png")
-
-    # Convert to OpenCV format
-    nparr = np.frombuffer(img_data, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    # Threshold to find black regions
-    _, thresh = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-
-    # Find contours
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    # Filter for rectangular regions
-    for contour in contours:
-        x, y, w, h = cv2.boundingRect(contour)
-
-        # Filter out very small or very large boxes
-        if w > 20 and h > 10 and w < pix.width * 0.8 and h < pix.height * 0.8:
-            # Convert back to PDF coordinates (accounting for 2x scaling)
-            pdf_x0 = x / 2
-            pdf_y0 = y / 2
-            pdf_x1 = (x + w) / 2
-            pdf_y1 = (y + h) / 2
-
-            boxes.append({
-                "x0": round(pdf_x0, 1),
-                "y0": round(pdf_y0, 1),
-                "x1": round(pdf_x1, 1),
-                "y1": round(pdf_y1, 1),
-                "width": round((pdf_x1 - pdf_x0), 1),
-                "height": round((pdf_y1 - pdf_y0), 1),
-                "page": page_num
-            })
-
+    boxes = _find_boxes_in_page(doc[page_num])
     doc.close()
     return boxes
 
@@ -99,11 +103,14 @@ def replace_boxes_in_pdf(
     else:
         page_range = range(len(doc))
 
+    # Text width scales linearly with font size, so measure the text only once
+    unit_text_width = fitz.get_text_length(replacement_text, fontname="helv", fontsize=1)
+
     for pnum in page_range:
         page = doc[pnum]
 
-        # Find boxes on this page
-        boxes = find_boxes_in_pdf(pdf_path, pnum)
+        # Find boxes on the already-open page instead of reopening the file
+        boxes = _find_boxes_in_page(page)
 
         # Filter for matching dimensions
         matching_boxes = [
@@ -115,60 +122,39 @@ def replace_boxes_in_pdf(
         if not matching_boxes:
             continue
 
-        # Render page to image at high resolution
-        mat = fitz.Matrix(2, 2)
-        pix = page.get_pixmap(matrix=mat)
+        # Cover each box with a white rectangle and centered text as vector
+        # content on the existing page; the rest of the page stays untouched
+        shape = page.new_shape()
 
-        # Convert to PIL Image
-        img_data = pix.tobytes("png")
-        img = Image.open(io.BytesIO(img_data))
-        draw = ImageDraw.Draw(img)
+        # Boxes are found on the rendered (rotated) page, but drawing happens in
+        # unrotated page space; the text is turned with the page to read upright
+        derotate = page.derotation_matrix
 
-        count = 0
         for box in matching_boxes:
-            # Scale coordinates by 2 (since we rendered at 2x)
-            x0 = box["x0"] * 2
-            y0 = box["y0"] * 2
-            x1 = box["x1"] * 2
-            y1 = box["y1"] * 2
-
-            # Draw white rectangle
-            draw.rectangle([x0, y0, x1, y1], fill='white', outline='black', width=2)
-
-            # Add text
-            font_size = int(min(box["height"] * 0.6, 12) * 2)
-            try:
-                font = ImageFont.truetype("arial.ttf", font_size)
-            except:
-                font = ImageFont.load_default()
-
-            # Center the text
-            bbox = draw.textbbox((0, 0), replacement_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            text_x = x0 + (x1 - x0 - text_width) / 2
-            text_y = y0 + (y1 - y0 - text_height) / 2
-
-            draw.text((text_x, text_y), replacement_text, fill='black', font=font)
-            count += 1
-
-        if count > 0:
-            # Convert back to bytes
-            img_bytes = io.BytesIO()
-            img.save(img_bytes, format='PNG')
-            img_bytes.seek(0)
-
-            # Replace the page with the modified image
-            img_pdf = fitz.open("png", img_bytes.read())
-            pdf_bytes = img_pdf.convert_to_pdf()
-            img_pdf.close()
-
-            # Replace the page
-            doc.delete_page(pnum)
-            doc.insert_pdf(fitz.open("pdf", pdf_bytes), from_page=0, to_page=0, start_at=pnum)
-
-            total_replaced += count
-            pages_modified.append(pnum)
+            rect = fitz.Rect(box["x0"], box["y0"], box["x1"], box["y1"])
+            shape.draw_rect(rect * derotate)
+            shape.finish(color=(0, 0, 0), fill=(1, 1, 1), width=0.5)
+
+            # Shrink the font when the text is wider than the box; insert_textbox
+            # writes nothing at all if the text does not fit
+            fontsize = min(box["height"] * 0.6, 12)
+            text_width = unit_text_width * fontsize
+            if text_width > rect.width - 2:
+                fontsize *= (rect.width - 2) / text_width
+
+            shape.insert_textbox(
+                rect * derotate,
+                replacement_text,
+                fontname="helv",
+                fontsize=fontsize,
+                align=fitz.TEXT_ALIGN_CENTER,
+                rotate=page.rotation
+            )
+
+        shape.commit()
+
+        total_replaced += len(matching_boxes)
+        pages_modified.append(pnum)
 
     # Save the modified PDF
     doc.save(output_path)
@@ -322,9 +308,9 @@ def detect_all_pages(pdf_path: str) -> dict:
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
+    # Open once and detect on each page of the same document
     doc = fitz.open(pdf_path)
     page_count = len(doc)
-    doc.close()
 
     results = {
         "pdf_path": pdf_path,
@@ -334,7 +320,7 @@ def detect_all_pages(pdf_path: str) -> dict:
 
     total_boxes = 0
     for page_num in range(page_count):
-        boxes = find_boxes_in_pdf(pdf_path, page_num)
+        boxes = _find_boxes_in_page(doc[page_num])
         total_boxes += len(boxes)
         results["pages"].append({
             "page_number": page_num,
@@ -342,6 +328,8 @@ def detect_all_pages(pdf_path: str) -> dict:
             "boxes": boxes
         })
 
+    doc.close()
+
     results["total_boxes"] = total_boxes
     return results
 
@@ -6,18 +6,60 @@ Deploy to: Railway, Render, Fly.io, or any platform that supports Python web app
 """
 
 import fitz  # PyMuPDF
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import cv2
 import numpy as np
-import io
-import base64
+import asyncio
+import itertools
+import multiprocessing
+import re
 import tempfile
 import os
-import uuid
+import mmap
+import sqlite3
+import threading
+import secrets
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
 from typing import Any
 
 from fastmcp import FastMCP
 
+try:
+    import pybase64 as base64  # Optional: SIMD base64 codec, API-compatible with the stdlib
+except ImportError:
+    import base64
+
+try:
+    import numba
+    from numba import njit, prange  # Optional: compiles the inner pixel/box loops to native code
+except ImportError:
+    numba = njit = prange = None
+
+# Tesseract runs several at a time (OCR threads here, one per pool worker),
+# so keep each to one OpenMP thread. OpenMP reads this when the library
+# loads, so it must be set before tesserocr is imported; pool workers and
+# tesseract subprocesses inherit it
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+try:
+    from tesserocr import PyTessBaseAPI, PSM  # Optional: keeps Tesseract loaded in-process
+except ImportError:
+    PyTessBaseAPI = None
+
+try:
+    import brotli  # Optional: adds a Brotli variant of the widget assets
+except ImportError:
+    brotli = None
+
+try:
+    import orjson  # Optional: C JSON encoder for the large base64 tool responses
+except ImportError:
+    orjson = None
+
 # Create the MCP server with HTTP transport
 mcp = FastMCP(
     "unredactor",
@@ -36,76 +78,632 @@ mcp = FastMCP(
     """
 )
 
-# Temporary storage for uploaded PDFs (in production, use proper storage)
-TEMP_DIR = tempfile.mkdtemp(prefix="unredactor_")
-uploaded_files: dict[str, str] = {}
+class FileIndex(MutableMapping):
+    """
+    Mapping of file IDs to PDF paths, stored in SQLite.
 
+    Every server process pointed at the same TEMP_DIR sees the same uploads,
+    so requests for one file can land on any uvicorn worker.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS files (file_id TEXT PRIMARY KEY, path TEXT NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __getitem__(self, file_id: str) -> str:
+        row = self._connect().execute("SELECT path FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        if row is None:
+            raise KeyError(file_id)
+        return row[0]
+
+    def __setitem__(self, file_id: str, path: str) -> None:
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO files (file_id, path) VALUES (?, ?)", (file_id, path))
+
+    def __delitem__(self, file_id: str) -> None:
+        with self._connect() as conn:
+            if conn.execute("DELETE FROM files WHERE file_id = ?", (file_id,)).rowcount == 0:
+                raise KeyError(file_id)
+
+    def __iter__(self):
+        return iter([row[0] for row in self._connect().execute("SELECT file_id FROM files")])
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+
+# Temporary storage for uploaded PDFs (in production, use proper storage).
+# Set UNREDACTOR_TEMP_DIR to a shared directory when running several workers
+TEMP_DIR = os.environ.get("UNREDACTOR_TEMP_DIR") or tempfile.mkdtemp(prefix="unredactor_")
+os.makedirs(TEMP_DIR, exist_ok=True)
+# Pool workers import this module afresh; point them at the same directory
+os.environ["UNREDACTOR_TEMP_DIR"] = TEMP_DIR
+uploaded_files = FileIndex(os.path.join(TEMP_DIR, "files.sqlite3"))
+
+# Page detection is CPU-bound and PyMuPDF holds the GIL, so multi-page work
+# fans out to processes. Gains plateau past ~4 workers.
+DEFAULT_WORKERS = min(os.cpu_count() or 1, 4)
+
+# Worker pool of DEFAULT_WORKERS processes shared by all multi-page calls,
+# started on first use. The pool is first used from a tool call's worker
+# thread, and forking there would copy whatever MuPDF, OpenCV or logging
+# locks other threads hold. Workers therefore come from a single-threaded
+# fork server (spawn where that is unavailable) that preloads this module.
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _POOL_CONTEXT = multiprocessing.get_context("forkserver")
+    _POOL_CONTEXT.set_forkserver_preload([__name__])
+else:
+    _POOL_CONTEXT = multiprocessing.get_context("spawn")
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+# Concurrent tesseract runs per page; more than 4 only adds context switching.
+# Pool workers use one run each, as pages are already spread over processes
+OCR_WORKERS = 4
+_ocr_workers = OCR_WORKERS
+
+# Read-only documents kept open between tool calls, keyed by (thread, path).
+# PyMuPDF documents are not thread-safe, so tool calls running on different
+# threads never share one; the size allows a few handles per busy thread
+_DOC_CACHE_SIZE = 32
+_doc_cache: "OrderedDict[tuple[int, str], tuple[float, fitz.Document]]" = OrderedDict()
+_doc_cache_lock = threading.Lock()
+
+# Detection results per (path, page, mtime); detection is deterministic for
+# an unmodified file, so repeat tool calls on the same upload skip the render
+_DETECTION_CACHE_SIZE = 256
+_detection_cache: "OrderedDict[tuple[str, int, float], dict[str, np.ndarray]]" = OrderedDict()
+_detection_cache_lock = threading.Lock()
+
+# Render scale for box detection; box arrays are in pixels at this scale
+DETECTION_SCALE = 1.0
+
+# Smallest box considered a redaction, in PDF points
+MIN_BOX_WIDTH = 10
+MIN_BOX_HEIGHT = 5
+
+# Structuring element for removing speckle from the black-pixel mask
+_SPECKLE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+# Very large pages run the mask passes through OpenCL (via cv2.UMat) when a
+# device is available; for ordinary pages the upload costs more than it saves
+_USE_OPENCL = cv2.ocl.haveOpenCL()
+_OPENCL_MIN_PIXELS = 4_000_000
+
+# OpenCV's threshold is hand-vectorized for AVX2/NEON; on CPUs without either,
+# a Numba kernel (when installed) auto-vectorizes and threads it instead.
+# opencv-python doesn't export the CPU_* feature constants, so these are the
+# numeric IDs from OpenCV's cv::CpuFeatures
+_CV_CPU_AVX2 = 11
+_CV_CPU_NEON = 100
+_NUMBA_THRESHOLD = njit is not None and not (
+    cv2.checkHardwareSupport(_CV_CPU_AVX2) or cv2.checkHardwareSupport(_CV_CPU_NEON)
+)
+
+# MuPDF keeps decoded fonts and images in a process-wide store that only
+# shrinks under allocation pressure. PyMuPDF can't report its size, so the
+# least recently used half is released every this many renders instead
+_MUPDF_STORE_TRIM_EVERY = 64
+_mupdf_renders = itertools.count(1)
+
+# Per-thread scratch buffers for the CPU mask passes, reused across pages.
+# Larger requests (poster-sized pages) get fresh arrays so one outlier page
+# doesn't pin its buffers on the thread for good
+_scratch_buffers = threading.local()
+_SCRATCH_MAX_PIXELS = 1 << 22
+
+# Base64 is converted in slices of this many input bytes (a multiple of 3) so a
+# whole PDF never sits in memory in both encoded and decoded form
+_B64_CHUNK_BYTES = 3 << 18
+_B64_NON_ALPHABET = re.compile(r"[^A-Za-z0-9+/=]")
+
+# Base64 text of recently downloaded files per (path, mtime_ns, size); a few
+# entries only, since each one is about 4/3 of a whole PDF
+_ENCODED_CACHE_SIZE = 4
+_encoded_cache: "OrderedDict[tuple[str, int, int], str]" = OrderedDict()
+_encoded_cache_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    """
+    Give a forked child its own cache locks and no open documents.
+
+    Pool workers don't fork from the server process, but anything else that
+    does may fork while another thread holds one of these locks, which the
+    child would inherit locked. It must not share open file handles either.
+    """
+    global _doc_cache_lock, _detection_cache_lock, _encoded_cache_lock
+    _doc_cache_lock = threading.Lock()
+    _detection_cache_lock = threading.Lock()
+    _encoded_cache_lock = threading.Lock()
+    _doc_cache.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _open_cached(pdf_path: str) -> "fitz.Document":
+    """
+    Open a PDF for read-only use, reusing a handle this thread opened recently.
+
+    Each thread gets its own handle, which only that thread ever uses.
+    Entries are invalidated when the file's mtime changes. Callers must not
+    modify or close the returned document; use _close_cached to release it.
+    """
+    mtime = os.path.getmtime(pdf_path)
+    key = (threading.get_ident(), pdf_path)
+    with _doc_cache_lock:
+        # Release handles to files deleted since they were opened; pool
+        # workers never see the _close_cached call made in the parent
+        for stale in [k for k in _doc_cache if not os.path.exists(k[1])]:
+            del _doc_cache[stale]
+
+        entry = _doc_cache.get(key)
+        if entry is not None and entry[0] == mtime:
+            _doc_cache.move_to_end(key)
+            return entry[1]
 
-def find_boxes_in_pdf(pdf_path: str, page_num: int = 0) -> list[dict]:
-    """Find all black rectangles on a PDF page using image processing."""
     doc = fitz.open(pdf_path)
+    with _doc_cache_lock:
+        _doc_cache[key] = (mtime, doc)
+        _doc_cache.move_to_end(key)
+
+        # Evicted documents may still be in use; let them close on release
+        while len(_doc_cache) > _DOC_CACHE_SIZE:
+            _doc_cache.popitem(last=False)
+
+    return doc
+
+
+def _close_cached(pdf_path: str) -> None:
+    """
+    Drop every thread's cached handle for a PDF.
+
+    Only this thread's handle is closed here; other threads may still be
+    using theirs, which close once they are released.
+    """
+    own_key = (threading.get_ident(), pdf_path)
+    with _doc_cache_lock:
+        entries = {key: _doc_cache.pop(key) for key in [k for k in _doc_cache if k[1] == pdf_path]}
+    if own_key in entries:
+        entries[own_key][1].close()
+
+
+def _b64decode_to_file(data: str, f) -> None:
+    """
+    Decode base64 text into a binary file, one slice at a time.
+
+    The result matches base64.b64decode on the whole string. Characters
+    outside the alphabet are dropped before slicing, as b64decode ignores
+    them and they would shift the 4-character alignment of later slices.
+    Padding ends decoding, so everything from the first "=" on is decoded
+    in one piece.
+    """
+    if not data.isascii():
+        raise ValueError("string argument should contain only ASCII characters")
+
+    chunk_chars = _B64_CHUNK_BYTES // 3 * 4
+    carry = ""
+    for start in range(0, len(data), chunk_chars):
+        chunk = carry + _B64_NON_ALPHABET.sub("", data[start:start + chunk_chars])
+        if "=" in chunk:
+            carry = chunk + _B64_NON_ALPHABET.sub("", data[start + chunk_chars:])
+            break
+        cut = len(chunk) - len(chunk) % 4
+        carry = chunk[cut:]
+        f.write(base64.b64decode(chunk[:cut]))
+
+    # The padded tail, or a partial quartet if the input was truncated
+    if carry:
+        f.write(base64.b64decode(carry))
+
+
+def _b64encode_file(path: str) -> str:
+    """
+    Base64-encode a file's contents one slice at a time.
+
+    The file is memory-mapped, so slices are views of the page cache rather
+    than read() copies.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return "".join(
+                    base64.b64encode(view[start:start + _B64_CHUNK_BYTES]).decode('ascii')
+                    for start in range(0, size, _B64_CHUNK_BYTES)
+                )
+            finally:
+                view.release()
+
+
+def _b64encode_cached(path: str) -> str:
+    """_b64encode_file, reusing the last encoding while the file is unchanged."""
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _encoded_cache_lock:
+        if key in _encoded_cache:
+            _encoded_cache.move_to_end(key)
+            return _encoded_cache[key]
+
+    encoded = _b64encode_file(path)
+    with _encoded_cache_lock:
+        for stale in [k for k in _encoded_cache if k[0] == path]:
+            del _encoded_cache[stale]
+        _encoded_cache[key] = encoded
+        while len(_encoded_cache) > _ENCODED_CACHE_SIZE:
+            _encoded_cache.popitem(last=False)
+    return encoded
+
+
+def _forget_encoded(path: str) -> None:
+    """Drop a file's cached base64 text."""
+    with _encoded_cache_lock:
+        for key in [key for key in _encoded_cache if key[0] == path]:
+            del _encoded_cache[key]
+
+
+def _trim_mupdf_store() -> None:
+    """Shrink MuPDF's store by half every _MUPDF_STORE_TRIM_EVERY renders."""
+    if next(_mupdf_renders) % _MUPDF_STORE_TRIM_EVERY == 0:
+        fitz.TOOLS.store_shrink(50)
+
+
+@lru_cache(maxsize=32)
+def _get_font(fontname: str = "helv") -> "fitz.Font":
+    """Load a font once per process for measuring replacement text."""
+    return fitz.Font(fontname)
+
+
+def _scratch(name: str, shape: tuple[int, int], dtype=np.uint8) -> np.ndarray:
+    """Return a reusable per-thread buffer viewed as a contiguous `shape` array."""
+    size = shape[0] * shape[1]
+    if size > _SCRATCH_MAX_PIXELS:
+        return np.empty(shape, dtype)
+    buf = getattr(_scratch_buffers, name, None)
+    if buf is None or buf.size < size or buf.dtype != dtype:
+        buf = np.empty(size, dtype)
+        setattr(_scratch_buffers, name, buf)
+    return buf[:size].reshape(shape)
+
+
+def _pixmap_to_gray(pix: "fitz.Pixmap") -> np.ndarray:
+    """
+    View a pixmap's raw samples as a single-channel image for OpenCV.
+
+    A grayscale pixmap is viewed in place, without copying; the caller must
+    keep `pix` alive for as long as it uses the returned array.
+    """
+    if pix.n == 1:
+        return np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width)
+
+    arr = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    code = cv2.COLOR_RGBA2GRAY if pix.n == 4 else cv2.COLOR_RGB2GRAY
+    return cv2.cvtColor(arr, code)
+
+
+def _filter_box_stats_numpy(stats: np.ndarray, min_w, min_h, max_w, max_h) -> np.ndarray:
+    """
+    Keep the component stats rows whose size looks like a redaction box.
+
+    Returns an (M, 6) int32 array of [x0, y0, x1, y1, width, height] rows.
+    """
+    ws = stats[:, cv2.CC_STAT_WIDTH]
+    hs = stats[:, cv2.CC_STAT_HEIGHT]
+    kept = stats[(ws > min_w) & (hs > min_h) & (ws < max_w) & (hs < max_h)]
+
+    xs = kept[:, cv2.CC_STAT_LEFT]
+    ys = kept[:, cv2.CC_STAT_TOP]
+    ws = kept[:, cv2.CC_STAT_WIDTH]
+    hs = kept[:, cv2.CC_STAT_HEIGHT]
+    return np.stack([xs, ys, xs + ws, ys + hs, ws, hs], axis=1).astype(np.int32, copy=False)
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _filter_box_stats(stats, min_w, min_h, max_w, max_h):
+        """Numba version of _filter_box_stats_numpy; filters and expands rows in one pass."""
+        out = np.empty((stats.shape[0], 6), np.int32)
+        m = 0
+        for i in range(stats.shape[0]):
+            x = stats[i, 0]  # cv2.CC_STAT_LEFT
+            y = stats[i, 1]  # cv2.CC_STAT_TOP
+            w = stats[i, 2]  # cv2.CC_STAT_WIDTH
+            h = stats[i, 3]  # cv2.CC_STAT_HEIGHT
+            if w > min_w and h > min_h and w < max_w and h < max_h:
+                out[m, 0] = x
+                out[m, 1] = y
+                out[m, 2] = x + w
+                out[m, 3] = y + h
+                out[m, 4] = w
+                out[m, 5] = h
+                m += 1
+        return out[:m]
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _threshold_black(gray, thresh, out):
+        """Numba equivalent of cv2.threshold(gray, thresh, 255, THRESH_BINARY_INV, dst=out)."""
+        height, width = gray.shape
+        for y in prange(height):
+            for x in range(width):
+                out[y, x] = 0 if gray[y, x] > thresh else 255
+else:
+    _filter_box_stats = _filter_box_stats_numpy
+
+
+def _render_page_pixmap(page, scale: float = DETECTION_SCALE) -> "fitz.Pixmap":
+    """
+    Render a PDF page to a grayscale pixmap at `scale`.
+
+    Detection only needs luminance, so the page is rendered grayscale.
+    Redaction boxes are large enough that native resolution (scale 1.0)
+    finds them reliably; higher scales only add pixels to process.
+    """
+    mat = fitz.Matrix(scale, scale)
+    return page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+
+
+def _detect_box_arrays(gray: np.ndarray, scale: float = DETECTION_SCALE) -> dict[str, np.ndarray]:
+    """
+    Find all black rectangles in a grayscale page image rendered at `scale`.
+
+    Returns one integer array per field ("x0", "y0", "x1", "y1", "width",
+    "height") in render pixels, so callers can filter boxes with vectorized
+    masks. Use _boxes_to_dicts to convert them to PDF points.
+    """
+    if _USE_OPENCL and gray.size >= _OPENCL_MIN_PIXELS:
+        # Threshold to find black regions, then drop scan/JPEG speckle and thin
+        # strokes so they don't become components
+        _, thresh = cv2.threshold(cv2.UMat(gray), 50, 255, cv2.THRESH_BINARY_INV)
+        mask = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, _SPECKLE_KERNEL, iterations=1)
+        labels = None
+    else:
+        # Same passes on the CPU, writing into reused buffers instead of fresh allocations
+        thresh = _scratch("thresh", gray.shape)
+        mask = _scratch("mask", gray.shape)
+        labels = _scratch("labels", gray.shape, np.int32)
+        if _NUMBA_THRESHOLD:
+            _threshold_black(gray, 50, thresh)
+        else:
+            cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV, dst=thresh)
+        cv2.morphologyEx(thresh, cv2.MORPH_OPEN, _SPECKLE_KERNEL, dst=mask, iterations=1)
+
+    # Label connected black regions; stats rows are [x, y, w, h, area] (row 0 is background).
+    # Boxes are solid rectangles, so 4-connectivity finds them whole and keeps
+    # diagonally touching boxes apart
+    _, _, stats, _ = cv2.connectedComponentsWithStats(
+        mask, labels=labels, connectivity=4, ltype=cv2.CV_32S
+    )
+    if isinstance(stats, cv2.UMat):
+        stats = stats.get()
+    stats = stats[1:]
+
+    # Filter out very small or very large boxes
+    boxes = _filter_box_stats(
+        stats,
+        MIN_BOX_WIDTH * scale, MIN_BOX_HEIGHT * scale,
+        gray.shape[1] * 0.8, gray.shape[0] * 0.8
+    )
+
+    return {key: boxes[:, i] for i, key in enumerate(("x0", "y0", "x1", "y1", "width", "height"))}
+
+
+def _find_box_arrays_in_page(page, scale: float = DETECTION_SCALE) -> dict[str, np.ndarray]:
+    """Find all black rectangles on an already-opened PDF page, as pixel arrays."""
+    pix = _render_page_pixmap(page, scale)
+    _trim_mupdf_store()
+
+    # Detect on a view of the pixmap's own buffer (no PNG round-trip, no copy);
+    # `pix` stays referenced here until detection is done
+    return _detect_box_arrays(_pixmap_to_gray(pix), scale)
+
+
+def _boxes_to_dicts(
+    arrays: dict[str, np.ndarray],
+    page_num: int,
+    scale: float = DETECTION_SCALE
+) -> list[dict]:
+    """Convert pixel box arrays into the PDF-point dicts returned by the tools."""
+    coords = np.column_stack((
+        arrays["x0"], arrays["y0"], arrays["x1"], arrays["y1"], arrays["width"], arrays["height"]
+    ))
+    coords = np.round(coords / scale, 1)
+
+    return [
+        {"x0": x0, "y0": y0, "x1": x1, "y1": y1, "width": w, "height": h, "page": page_num}
+        for x0, y0, x1, y1, w, h in coords.tolist()
+    ]
+
+
+def _group_boxes_by_size(arrays: dict[str, np.ndarray], boxes: list[dict]) -> list[dict]:
+    """
+    Group boxes with identical dimensions, in order of first appearance.
+
+    `boxes` is the _boxes_to_dicts output for `arrays`. Grouping is done on
+    the integer pixel sizes with np.unique rather than per-box dict lookups.
+    """
+    if not boxes:
+        return []
+
+    keys = arrays["width"].astype(np.int64) * 100000 + arrays["height"]
+    _, first, inverse, counts = np.unique(
+        keys, return_index=True, return_inverse=True, return_counts=True
+    )
+    # Box indices ordered by group, keeping detection order within each group
+    members = np.argsort(inverse.ravel(), kind="stable")
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    groups = []
+    for group in np.argsort(first).tolist():
+        indices = members[starts[group]:starts[group] + counts[group]].tolist()
+        first_box = boxes[indices[0]]
+        groups.append({
+            "width": first_box["width"],
+            "height": first_box["height"],
+            "count": len(indices),
+            "boxes": [
+                {"x0": boxes[i]["x0"], "y0": boxes[i]["y0"], "x1": boxes[i]["x1"], "y1": boxes[i]["y1"]}
+                for i in indices
+            ]
+        })
+
+    return groups
+
+
+def _find_box_arrays(
+    pdf_path: str | None,
+    page_num: int = 0,
+    doc: "fitz.Document | None" = None
+) -> dict[str, np.ndarray]:
+    """
+    Find all black rectangles on a PDF page, as arrays.
+
+    Pass `doc` to reuse an already-opened document; otherwise `pdf_path`
+    is opened through the document cache.
+    """
+    if doc is None:
+        doc = _open_cached(pdf_path)
 
     if page_num >= len(doc):
-        doc.close()
         raise ValueError(f"Page {page_num} does not exist. PDF has {len(doc)} pages.")
 
-    page = doc[page_num]
-    boxes = []
-
-    # Render page to image at 2x for better detection
-    mat = fitz.Matrix(2, 2)
-    pix = page.get_pixmap(matrix=mat)
-    img_data = pix.tobytes("png")
-
-    # Convert to OpenCV format
-    nparr = np.frombuffer(img_data, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    # Threshold to find black regions
-    _, thresh = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
-
-    # Find contours
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    # Filter for rectangular regions
-    for contour in contours:
-        x, y, w, h = cv2.boundingRect(contour)
-
-        # Filter out very small or very large boxes
-        if w > 20 and h > 10 and w < pix.width * 0.8 and h < pix.height * 0.8:
-            # Convert back to PDF coordinates (accounting for 2x scaling)
-            pdf_x0 = x / 2
-            pdf_y0 = y / 2
-            pdf_x1 = (x + w) / 2
-            pdf_y1 = (y + h) / 2
-
-            boxes.append({
-                "x0": round(pdf_x0, 1),
-                "y0": round(pdf_y0, 1),
-                "x1": round(pdf_x1, 1),
-                "y1": round(pdf_y1, 1),
-                "width": round((pdf_x1 - pdf_x0), 1),
-                "height": round((pdf_y1 - pdf_y0), 1),
-                "page": page_num
-            })
+    return _find_box_arrays_in_page(doc[page_num])
 
-    doc.close()
-    return boxes
+
+def find_boxes_in_pdf(
+    pdf_path: str | None,
+    page_num: int = 0,
+    doc: "fitz.Document | None" = None
+) -> list[dict]:
+    """Find all black rectangles on a PDF page using image processing."""
+    return _boxes_to_dicts(_find_box_arrays(pdf_path, page_num, doc=doc), page_num)
+
+
+def _init_worker() -> None:
+    """
+    Pin OpenCV, Numba (if present) and OCR to one thread in each pool worker.
+
+    Pages are already spread across worker processes; letting each library
+    start its own threads in every worker oversubscribes the cores. Tesseract's
+    own OpenMP threads are limited by OMP_THREAD_LIMIT, set at import time.
+    """
+    global _ocr_workers
+    cv2.setNumThreads(1)
+    if numba is not None:
+        numba.set_num_threads(1)
+    _ocr_workers = 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared worker pool, starting it if needed.
+
+    Workers live as long as the server, so later calls skip process start-up
+    and reuse the documents each worker already has open. The pool size is
+    fixed; requests never resize or restart a pool other requests are using.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=DEFAULT_WORKERS, mp_context=_POOL_CONTEXT, initializer=_init_worker
+            )
+        return _pool
+
+
+def _pool_map(fn, *iterables) -> list:
+    """executor.map over the shared pool, in order; a pool broken by a dead worker is replaced next call."""
+    global _pool
+    pool = _get_pool()
+    try:
+        return list(pool.map(fn, *iterables))
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
+
+
+def _detect_pages_parallel(pdf_path: str, page_numbers) -> list[dict[str, np.ndarray]]:
+    """Run box detection over several pages in worker processes, in page order."""
+    return _pool_map(partial(_find_box_arrays, pdf_path), page_numbers)
+
+
+def _detect_pages(pdf_path: str, page_numbers, parallel: bool = False) -> list[dict[str, np.ndarray]]:
+    """
+    Find the box arrays for several pages of a file, reusing earlier results.
+
+    Pages not seen before are detected, in the worker pool when `parallel` is set.
+    The returned arrays are shared between callers and are read-only.
+    """
+    mtime = os.path.getmtime(pdf_path)
+    keys = [(pdf_path, page_num, mtime) for page_num in page_numbers]
+
+    with _detection_cache_lock:
+        results = {key: _detection_cache[key] for key in keys if key in _detection_cache}
+        for key in results:
+            _detection_cache.move_to_end(key)
+
+    missing = [key[1] for key in keys if key not in results]
+    if missing:
+        if parallel and DEFAULT_WORKERS > 1 and len(missing) > 1:
+            detected = _detect_pages_parallel(pdf_path, missing)
+        else:
+            detected = [_find_box_arrays(pdf_path, page_num) for page_num in missing]
+
+        with _detection_cache_lock:
+            for page_num, arrays in zip(missing, detected):
+                for values in arrays.values():
+                    values.flags.writeable = False
+                key = (pdf_path, page_num, mtime)
+                _detection_cache[key] = results[key] = arrays
+
+            while len(_detection_cache) > _DETECTION_CACHE_SIZE:
+                _detection_cache.popitem(last=False)
+
+    return [results[key] for key in keys]
 
 
-def is_pdf_text_based(pdf_path: str, sample_pages: int = 3) -> dict:
+def _forget_detections(pdf_path: str) -> None:
+    """Drop every cached detection result for a file that is going away."""
+    with _detection_cache_lock:
+        for key in [key for key in _detection_cache if key[0] == pdf_path]:
+            del _detection_cache[key]
+
+
+def is_pdf_text_based(
+    pdf_path: str | None,
+    sample_pages: int = 3,
+    doc: "fitz.Document | None" = None
+) -> dict:
     """
     Determine if a PDF contains actual text or is image-based (scanned).
 
     Args:
         pdf_path: Path to the PDF file
         sample_pages: Number of pages to check (default: 3)
+        doc: Already-opened document to analyze instead of opening pdf_path
 
     Returns:
         Dictionary with analysis results
     """
-    doc = fitz.open(pdf_path)
+    if doc is None:
+        doc = _open_cached(pdf_path)
     total_pages = len(doc)
     pages_to_check = min(sample_pages, total_pages)
 
@@ -164,10 +762,151 @@ def is_pdf_text_based(pdf_path: str, sample_pages: int = 3) -> dict:
     else:
         results["recommendation"] = "PDF appears to be image-based - OCR may be required for text extraction"
 
-    doc.close()
     return results
 
 
+def _render_ocr_crop(page, rect) -> Image.Image:
+    """Render a page region at high resolution as a grayscale image for OCR."""
+    mat = fitz.Matrix(3, 3)  # 3x scale for OCR accuracy
+    # Tesseract binarizes internally, so a grayscale render is all it needs
+    pix = page.get_pixmap(matrix=mat, clip=rect, colorspace=fitz.csGRAY, alpha=False)
+
+    # Build the PIL Image from the raw samples, no PNG round-trip
+    return Image.frombytes("L", (pix.width, pix.height), pix.samples)
+
+
+def _ocr_images(images: list[Image.Image]) -> list[str]:
+    """
+    Run OCR over several images, loading Tesseract as few times as possible.
+
+    Uses tesserocr's in-process API when it is installed; otherwise the
+    images are shared out over up to OCR_WORKERS tesseract invocations (one
+    inside pool workers), each reading its images from a list file.
+    """
+    if PyTessBaseAPI is not None:
+        texts = []
+        with PyTessBaseAPI(psm=PSM.SINGLE_BLOCK) as api:
+            for img in images:
+                api.SetImage(img)
+                texts.append(api.GetUTF8Text().strip())
+        return texts
+
+    # Split the images across a few concurrent runs; pytesseract waits on the
+    # subprocess outside the GIL
+    num_runs = min(_ocr_workers, len(images))
+    batches = [images[k::num_runs] for k in range(num_runs)]
+
+    with tempfile.TemporaryDirectory(dir=TEMP_DIR) as batch_dir:
+        with ThreadPoolExecutor(max_workers=num_runs) as executor:
+            batch_texts = list(executor.map(
+                partial(_tesseract_batch, batch_dir), range(num_runs), batches
+            ))
+
+    # Undo the round-robin split
+    texts = [""] * len(images)
+    for k, batch in enumerate(batch_texts):
+        texts[k::num_runs] = batch
+    return texts
+
+
+def _tesseract_batch(batch_dir: str, batch_id: int, images: list[Image.Image]) -> list[str]:
+    """OCR a list of images with one tesseract invocation."""
+    import pytesseract
+
+    image_paths = []
+    for i, img in enumerate(images):
+        # Uncompressed PGM: nothing to deflate here or inflate in Tesseract
+        image_path = os.path.join(batch_dir, f"{batch_id}_{i}.pgm")
+        img.save(image_path)
+        image_paths.append(image_path)
+
+    list_path = os.path.join(batch_dir, f"{batch_id}.txt")
+    with open(list_path, "w") as f:
+        f.write("\n".join(image_paths) + "\n")
+
+    output = pytesseract.image_to_string(list_path, config='--psm 6')
+
+    # Tesseract separates the text of consecutive images with a form feed
+    texts = [text.strip() for text in output.split("\f")]
+    texts += [""] * (len(images) - len(texts))
+    return texts[:len(images)]
+
+
+def _join_words(words) -> str:
+    """Join get_text("words") entries back into text, one line per text line."""
+    lines: dict[tuple[int, int], list[str]] = {}
+    for word in words:
+        lines.setdefault((word[5], word[6]), []).append(word[4])
+    return "\n".join(" ".join(line) for line in lines.values())
+
+
+def extract_text_from_regions(page, regions, use_ocr=True):
+    """
+    Extract text from several regions of a PDF page.
+
+    Works like extract_text_from_region, but all regions without a text
+    layer are OCR'd together in one batch.
+
+    Args:
+        page: PyMuPDF page object
+        regions: Sequence of (x0, y0, x1, y1) coordinates on the rendered
+            (rotated) page, as returned by box detection
+        use_ocr: Whether to use OCR as fallback (default: True)
+
+    Returns:
+        List with the extracted text or "[No text found]" for each region
+    """
+    texts = ["[No text found]"] * len(regions)
+    ocr_indices = []
+
+    # First try: Extract text from PDF text layer. The page's words are read
+    # once and assigned to regions by their centers, rather than re-running
+    # text extraction with a clip for every region
+    words = page.get_text("words")
+    if words:
+        coords = np.array([word[:4] for word in words], dtype=np.float32)
+        centers_x = (coords[:, 0] + coords[:, 2]) / 2
+        centers_y = (coords[:, 1] + coords[:, 3]) / 2
+
+    # Words are reported in unrotated page space
+    derotate = page.derotation_matrix
+
+    for i, region in enumerate(regions):
+        text = ""
+        if words:
+            x0, y0, x1, y1 = fitz.Rect(region) * derotate
+            inside = np.flatnonzero(
+                (centers_x >= x0) & (centers_x <= x1) & (centers_y >= y0) & (centers_y <= y1)
+            )
+            text = _join_words([words[k] for k in inside])
+
+        # If we found meaningful text, use it
+        if text and len(text) > 2:  # At least 3 characters
+            texts[i] = text
+        else:
+            ocr_indices.append(i)
+
+    # Second try: Use OCR on the remaining regions if enabled. Render clips
+    # are given on the rotated page, so the regions are used as they are
+    if use_ocr and ocr_indices:
+        try:
+            crops = [_render_ocr_crop(page, fitz.Rect(regions[i])) for i in ocr_indices]
+            _trim_mupdf_store()
+
+            # A blank region has nothing to read; don't hand it to Tesseract
+            inked = [(i, crop) for i, crop in zip(ocr_indices, crops) if np.asarray(crop).mean() <= 250]
+            ocr_texts = _ocr_images([crop for _, crop in inked]) if inked else []
+
+            for (i, _), ocr_text in zip(inked, ocr_texts):
+                if ocr_text:
+                    texts[i] = f"{ocr_text} [OCR]"  # Mark as OCR-extracted
+
+        except Exception as e:
+            print(f"OCR failed: {e}")
+
+    return texts
+
+
 def extract_text_from_region(page, x0, y0, x1, y1, use_ocr=True):
     """
     Extract text from a specific region of a PDF page.
@@ -183,37 +922,82 @@ def extract_text_from_region(page, x0, y0, x1, y1, use_ocr=True):
     Returns:
         Extracted text or "[No text found]"
     """
-    import pytesseract
+    return extract_text_from_regions(page, [(x0, y0, x1, y1)], use_ocr)[0]
+
+
+def _match_box_sizes(
+    arrays: dict[str, np.ndarray],
+    target_width: float,
+    target_height: float,
+    tolerance: float
+) -> dict[str, np.ndarray]:
+    """Keep the boxes within `tolerance` points of the target size."""
+    # Compare in render pixels
+    mask = (
+        (np.abs(arrays["width"] - target_width * DETECTION_SCALE) <= tolerance * DETECTION_SCALE)
+        & (np.abs(arrays["height"] - target_height * DETECTION_SCALE) <= tolerance * DETECTION_SCALE)
+    )
+    return {key: values[mask] for key, values in arrays.items()}
 
-    # First try: Extract text from PDF text layer
-    rect = fitz.Rect(x0, y0, x1, y1)
-    text = page.get_text("text", clip=rect).strip()
 
-    # If we found meaningful text, return it
-    if text and len(text) > 2:  # At least 3 characters
-        return text
+def _read_hidden_text(page, boxes: list[dict], use_ocr: bool = True) -> list[dict]:
+    """Read the text under each box on a page, as discovered-text entries."""
+    hidden_texts = extract_text_from_regions(
+        page, [(box["x0"], box["y0"], box["x1"], box["y1"]) for box in boxes], use_ocr
+    )
 
-    # Second try: Use OCR if enabled and no text found
-    if use_ocr:
-        try:
-            # Render the region at high resolution for better OCR
-            mat = fitz.Matrix(3, 3)  # 3x scale for OCR accuracy
-            pix = page.get_pixmap(matrix=mat, clip=rect)
+    return [
+        {
+            "page": page.number,
+            "box": f"({box['x0']:.1f}, {box['y0']:.1f}, {box['x1']:.1f}, {box['y1']:.1f})",
+            "text": hidden_text,
+            "size": f"{box['width']:.1f}x{box['height']:.1f}"
+        }
+        for box, hidden_text in zip(boxes, hidden_texts)
+    ]
 
-            # Convert to PIL Image
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
 
-            # Run OCR
-            ocr_text = pytesseract.image_to_string(img, config='--psm 6').strip()
+def _draw_replacements(page, boxes: list[dict], replacement_text: str, unit_text_width: float) -> None:
+    """
+    Cover boxes with white rectangles holding the replacement text.
 
-            if ocr_text:
-                return f"{ocr_text} [OCR]"  # Mark as OCR-extracted
+    Everything is drawn as vector content on the existing page, keeping the
+    rest of the page (and its text layer) intact.
+    """
+    # Collect every box on one shape so the page content is only rewritten once
+    shape = page.new_shape()
 
-        except Exception as e:
-            print(f"OCR failed: {e}")
+    # Boxes are found on the rendered (rotated) page, but drawing happens in
+    # unrotated page space; the text is turned with the page to read upright
+    derotate = page.derotation_matrix
+
+    for box in boxes:
+        rect = fitz.Rect(box["x0"], box["y0"], box["x1"], box["y1"])
+        shape.draw_rect(rect * derotate)
+        shape.finish(color=(0, 0, 0), fill=(1, 1, 1), width=0.5)
+
+        # Shrink the font when the text is wider than the box; insert_textbox
+        # writes nothing at all if the text does not fit
+        fontsize = min(box["height"] * 0.6, 12)
+        text_width = unit_text_width * fontsize
+        if text_width > rect.width - 2:
+            fontsize *= (rect.width - 2) / text_width
+
+        shape.insert_textbox(
+            rect * derotate,
+            replacement_text,
+            fontname="helv",
+            fontsize=fontsize,
+            align=fitz.TEXT_ALIGN_CENTER,
+            rotate=page.rotation
+        )
+
+    shape.commit()
 
-    return "[No text found]"
+
+def _hidden_text_worker(pdf_path: str, pnum: int, boxes: list[dict], *, use_ocr: bool) -> list[dict]:
+    """Run _read_hidden_text on one page in a worker process."""
+    return _read_hidden_text(_open_cached(pdf_path)[pnum], boxes, use_ocr)
 
 
 def replace_boxes_in_pdf(
@@ -223,7 +1007,8 @@ def replace_boxes_in_pdf(
     target_height: float,
     replacement_text: str,
     page_num: int | None = None,
-    tolerance: float = 2.0
+    tolerance: float = 2.0,
+    parallel: bool = True
 ) -> dict:
     """Replace boxes of a specific size with white boxes containing text."""
     doc = fitz.open(pdf_path)
@@ -240,88 +1025,34 @@ def replace_boxes_in_pdf(
     else:
         page_range = range(len(doc))
 
-    for pnum in page_range:
-        page = doc[pnum]
-
-        # Find boxes on this page
-        boxes = find_boxes_in_pdf(pdf_path, pnum)
-
-        # Filter for matching dimensions
-        matching_boxes = [
-            box for box in boxes
-            if abs(box["width"] - target_width) <= tolerance
-            and abs(box["height"] - target_height) <= tolerance
-        ]
+    # A text-based PDF has its text layer to read from; whatever that misses
+    # is almost never recoverable by OCR, so skip it
+    use_ocr = not is_pdf_text_based(pdf_path, doc=doc)["is_text_based"]
+
+    # Keep the pages that have boxes of the target size
+    matches = {}
+    for pnum, arrays in zip(page_range, _detect_pages(pdf_path, page_range, parallel)):
+        matching = _match_box_sizes(arrays, target_width, target_height, tolerance)
+        if len(matching["x0"]):
+            matches[pnum] = _boxes_to_dicts(matching, pnum)
+
+    # Extract text from under the redaction boxes before any are covered.
+    # OCR is the expensive part; spread it over worker processes. Reading the
+    # text layer is cheap, so do that inline on the already open pages
+    if use_ocr and parallel and DEFAULT_WORKERS > 1 and len(matches) > 1:
+        worker = partial(_hidden_text_worker, pdf_path, use_ocr=use_ocr)
+        page_texts = _pool_map(worker, matches, matches.values())
+    else:
+        page_texts = [_read_hidden_text(doc[pnum], boxes, use_ocr) for pnum, boxes in matches.items()]
 
-        if not matching_boxes:
-            continue
+    # Text width scales linearly with font size, so measure the text only once
+    unit_text_width = _get_font("helv").text_length(replacement_text, fontsize=1)
 
-        # Render page to image at high resolution
-        mat = fitz.Matrix(2, 2)
-        pix = page.get_pixmap(matrix=mat)
-
-        # Convert to PIL Image
-        img_data = pix.tobytes("png")
-        img = Image.open(io.BytesIO(img_data))
-        draw = ImageDraw.Draw(img)
-
-        count = 0
-        for box in matching_boxes:
-            # FIRST: Extract text from under the redaction box (before covering it)
-            hidden_text = extract_text_from_region(page, box["x0"], box["y0"], box["x1"], box["y1"])
-            discovered_text.append({
-                "page": pnum,
-                "box": f"({box['x0']:.1f}, {box['y0']:.1f}, {box['x1']:.1f}, {box['y1']:.1f})",
-                "text": hidden_text,
-                "size": f"{box['width']:.1f}x{box['height']:.1f}"
-            })
-
-            # Scale coordinates by 2 (since we rendered at 2x)
-            x0 = box["x0"] * 2
-            y0 = box["y0"] * 2
-            x1 = box["x1"] * 2
-            y1 = box["y1"] * 2
-
-            # Draw white rectangle
-            draw.rectangle([x0, y0, x1, y1], fill='white', outline='black', width=2)
-
-            # Add text
-            font_size = int(min(box["height"] * 0.6, 12) * 2)
-            try:
-                font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", font_size)
-            except:
-                try:
-                    font = ImageFont.truetype("arial.ttf", font_size)
-                except:
-                    font = ImageFont.load_default()
-
-            # Center the text
-            bbox = draw.textbbox((0, 0), replacement_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            text_x = x0 + (x1 - x0 - text_width) / 2
-            text_y = y0 + (y1 - y0 - text_height) / 2
-
-            draw.text((text_x, text_y), replacement_text, fill='black', font=font)
-            count += 1
-
-        if count > 0:
-            # Convert back to bytes
-            img_bytes = io.BytesIO()
-            img.save(img_bytes, format='PNG')
-            img_bytes.seek(0)
-
-            # Replace the page with the modified image
-            img_pdf = fitz.open("png", img_bytes.read())
-            pdf_bytes = img_pdf.convert_to_pdf()
-            img_pdf.close()
-
-            # Replace the page
-            doc.delete_page(pnum)
-            doc.insert_pdf(fitz.open("pdf", pdf_bytes), from_page=0, to_page=0, start_at=pnum)
-
-            total_replaced += count
-            pages_modified.append(pnum)
+    for (pnum, matching_boxes), page_text in zip(matches.items(), page_texts):
+        discovered_text.extend(page_text)
+        _draw_replacements(doc[pnum], matching_boxes, replacement_text, unit_text_width)
+        total_replaced += len(matching_boxes)
+        pages_modified.append(pnum)
 
     # Save the modified PDF
     doc.save(output_path)
@@ -378,9 +1109,15 @@ def upload_pdf(pdf_base64: str, filename: str = "document.pdf") -> dict:
         # Still allow it, but warn
         print(f"Warning: Large PDF ({estimated_size_mb:.1f} MB). This may cause issues.")
 
+    # Generate unique ID and decode straight to disk
+    file_id = secrets.token_hex(4)
+    file_path = os.path.join(TEMP_DIR, f"{file_id}.pdf")
+
     try:
-        pdf_bytes = base64.b64decode(pdf_base64)
+        with open(file_path, 'wb') as f:
+            _b64decode_to_file(pdf_base64, f)
     except Exception as e:
+        os.remove(file_path)
         error_msg = str(e)
         if "Incorrect padding" in error_msg:
             raise ValueError(
@@ -391,22 +1128,16 @@ def upload_pdf(pdf_base64: str, filename: str = "document.pdf") -> dict:
         raise ValueError(f"Invalid base64 content: {e}")
 
     # Validate it's a PDF
-    if not pdf_bytes.startswith(b'%PDF'):
+    with open(file_path, 'rb') as f:
+        header = f.read(4)
+    if header != b'%PDF':
+        os.remove(file_path)
         raise ValueError("Invalid PDF file - content does not start with PDF header")
 
-    # Generate unique ID and save
-    file_id = str(uuid.uuid4())[:8]
-    file_path = os.path.join(TEMP_DIR, f"{file_id}.pdf")
-
-    with open(file_path, 'wb') as f:
-        f.write(pdf_bytes)
-
     uploaded_files[file_id] = file_path
 
-    # Get basic info
-    doc = fitz.open(file_path)
-    page_count = len(doc)
-    doc.close()
+    # Get basic info (this also warms the document cache for the next tool call)
+    page_count = len(_open_cached(file_path))
 
     return {
         "file_id": file_id,
@@ -435,7 +1166,7 @@ def get_pdf_info(file_id: str) -> dict:
         raise ValueError(f"File ID '{file_id}' not found. Please upload a PDF first.")
 
     pdf_path = uploaded_files[file_id]
-    doc = fitz.open(pdf_path)
+    doc = _open_cached(pdf_path)
 
     info = {
         "file_id": file_id,
@@ -451,7 +1182,6 @@ def get_pdf_info(file_id: str) -> dict:
             "height": round(rect.height, 1)
         })
 
-    doc.close()
     return info
 
 
@@ -491,8 +1221,6 @@ def detect_boxes_direct(pdf_base64: str, page_number: int = 0) -> dict:
     Returns:
         Dictionary with detected boxes and analysis
     """
-    import tempfile
-
     # Decode PDF
     try:
         pdf_bytes = base64.b64decode(pdf_base64)
@@ -502,24 +1230,21 @@ def detect_boxes_direct(pdf_base64: str, page_number: int = 0) -> dict:
     if not pdf_bytes.startswith(b'%PDF'):
         raise ValueError("Invalid PDF file")
 
-    # Save to temp file for processing
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-        tmp.write(pdf_bytes)
-        tmp_path = tmp.name
-
+    # Open straight from memory, once for both helpers, and keep it out of the document cache
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     try:
-        boxes = find_boxes_in_pdf(tmp_path, page_number)
-        pdf_analysis = is_pdf_text_based(tmp_path, sample_pages=1)
-
-        return {
-            "page_number": page_number,
-            "total_boxes_found": len(boxes),
-            "boxes": boxes,
-            "pdf_type": pdf_analysis["recommendation"],
-            "message": f"Found {len(boxes)} boxes on page {page_number}"
-        }
+        boxes = find_boxes_in_pdf(None, page_number, doc=doc)
+        pdf_analysis = is_pdf_text_based(None, sample_pages=1, doc=doc)
     finally:
-        os.unlink(tmp_path)
+        doc.close()
+
+    return {
+        "page_number": page_number,
+        "total_boxes_found": len(boxes),
+        "boxes": boxes,
+        "pdf_type": pdf_analysis["recommendation"],
+        "message": f"Found {len(boxes)} boxes on page {page_number}"
+    }
 
 
 @mcp.tool(annotations={"readOnlyHint": True, "destructiveHint": False, "openWorldHint": False})
@@ -541,35 +1266,18 @@ def detect_black_boxes(file_id: str, page_number: int = 0) -> dict:
         raise ValueError(f"File ID '{file_id}' not found. Please upload a PDF first.")
 
     pdf_path = uploaded_files[file_id]
-    boxes = find_boxes_in_pdf(pdf_path, page_number)
+    doc = _open_cached(pdf_path)
+    arrays = _detect_pages(pdf_path, [page_number])[0]
+    boxes = _boxes_to_dicts(arrays, page_number)
 
     # Analyze if PDF is text-based or image-based
-    pdf_analysis = is_pdf_text_based(pdf_path, sample_pages=1)
-
-    # Group boxes by size for easier selection
-    size_groups = {}
-    for box in boxes:
-        size_key = f"{box['width']}x{box['height']}"
-        if size_key not in size_groups:
-            size_groups[size_key] = {
-                "width": box["width"],
-                "height": box["height"],
-                "count": 0,
-                "boxes": []
-            }
-        size_groups[size_key]["count"] += 1
-        size_groups[size_key]["boxes"].append({
-            "x0": box["x0"],
-            "y0": box["y0"],
-            "x1": box["x1"],
-            "y1": box["y1"]
-        })
+    pdf_analysis = is_pdf_text_based(pdf_path, sample_pages=1, doc=doc)
 
     return {
         "file_id": file_id,
         "page_number": page_number,
         "total_boxes_found": len(boxes),
-        "boxes_by_size": list(size_groups.values()),
+        "boxes_by_size": _group_boxes_by_size(arrays, boxes),
         "boxes": boxes,
         "pdf_type": {
             "is_text_based": pdf_analysis["is_text_based"],
@@ -586,7 +1294,7 @@ def detect_black_boxes(file_id: str, page_number: int = 0) -> dict:
 
 
 @mcp.tool(annotations={"readOnlyHint": True, "destructiveHint": False, "openWorldHint": False})
-def detect_all_pages(file_id: str) -> dict:
+async def detect_all_pages(file_id: str) -> dict:
     """
     Detect black boxes on all pages of a PDF.
 
@@ -600,9 +1308,8 @@ def detect_all_pages(file_id: str) -> dict:
         raise ValueError(f"File ID '{file_id}' not found. Please upload a PDF first.")
 
     pdf_path = uploaded_files[file_id]
-    doc = fitz.open(pdf_path)
+    doc = _open_cached(pdf_path)
     page_count = len(doc)
-    doc.close()
 
     results = {
         "file_id": file_id,
@@ -610,9 +1317,12 @@ def detect_all_pages(file_id: str) -> dict:
         "pages": []
     }
 
+    # Wait for the page workers on a thread so the event loop stays responsive
+    page_arrays = await asyncio.to_thread(_detect_pages, pdf_path, range(page_count), True)
+
     total_boxes = 0
-    for page_num in range(page_count):
-        boxes = find_boxes_in_pdf(pdf_path, page_num)
+    for page_num, arrays in enumerate(page_arrays):
+        boxes = _boxes_to_dicts(arrays, page_num)
         total_boxes += len(boxes)
         results["pages"].append({
             "page_number": page_num,
@@ -630,7 +1340,7 @@ def detect_all_pages(file_id: str) -> dict:
 
 
 @mcp.tool(annotations={"readOnlyHint": False, "destructiveHint": False, "openWorldHint": True})
-def replace_redaction_boxes(
+async def replace_redaction_boxes(
     file_id: str,
     box_width: float,
     box_height: float,
@@ -661,10 +1371,13 @@ def replace_redaction_boxes(
     pdf_path = uploaded_files[file_id]
 
     # Create output path
-    output_id = str(uuid.uuid4())[:8]
+    output_id = secrets.token_hex(4)
     output_path = os.path.join(TEMP_DIR, f"{output_id}_modified.pdf")
 
-    result = replace_boxes_in_pdf(
+    # Page processing and the final save run on a worker thread so the
+    # event loop keeps serving other requests while the PDF is written
+    result = await asyncio.to_thread(
+        replace_boxes_in_pdf,
         pdf_path=pdf_path,
         output_path=output_path,
         target_width=box_width,
@@ -698,36 +1411,45 @@ def replace_redaction_boxes(
 
 
 @mcp.tool(annotations={"readOnlyHint": True, "destructiveHint": False, "openWorldHint": False})
-def download_pdf(file_id: str) -> dict:
+def download_pdf(file_id: str, include_base64: bool = True) -> dict:
     """
     Download a PDF file as base64-encoded content.
 
     Use this to retrieve the modified PDF after using replace_redaction_boxes.
+    The response also carries a download_url for fetching the raw PDF over
+    HTTP; clients that can use it should pass include_base64=False.
 
     Args:
         file_id: The file ID of the PDF to download
+        include_base64: Whether to inline the PDF as base64 (default: True)
 
     Returns:
-        Dictionary with base64-encoded PDF content
+        Dictionary with base64-encoded PDF content and/or its download URL
     """
     if file_id not in uploaded_files:
         raise ValueError(f"File ID '{file_id}' not found.")
 
     pdf_path = uploaded_files[file_id]
+    download_url = f"/api/download/{file_id}"
 
-    with open(pdf_path, 'rb') as f:
-        pdf_bytes = f.read()
-
-    return {
+    result = {
         "file_id": file_id,
-        "pdf_base64": base64.b64encode(pdf_bytes).decode('utf-8'),
-        "size_bytes": len(pdf_bytes),
+        "download_url": download_url,
+        "size_bytes": os.path.getsize(pdf_path),
         "_meta": {
-            "pdf_base64": base64.b64encode(pdf_bytes).decode('utf-8'),
+            "downloadUrl": download_url,
             "widgetAccessible": True
         }
     }
 
+    if include_base64:
+        # Encode once; the widget metadata references the same string
+        pdf_base64 = _b64encode_cached(pdf_path)
+        result["pdf_base64"] = pdf_base64
+        result["_meta"]["pdf_base64"] = pdf_base64
+
+    return result
+
 
 @mcp.tool(annotations={"readOnlyHint": False, "destructiveHint": True, "openWorldHint": False})
 def cleanup_file(file_id: str) -> dict:
@@ -744,6 +1466,9 @@ def cleanup_file(file_id: str) -> dict:
         raise ValueError(f"File ID '{file_id}' not found.")
 
     pdf_path = uploaded_files[file_id]
+    _close_cached(pdf_path)
+    _forget_detections(pdf_path)
+    _forget_encoded(pdf_path)
 
     try:
         os.remove(pdf_path)
@@ -759,13 +1484,27 @@ def cleanup_file(file_id: str) -> dict:
 
 
 # Add required ChatGPT App endpoints
-from starlette.responses import JSONResponse, PlainTextResponse, HTMLResponse, FileResponse, RedirectResponse
-from starlette.routing import Route, Mount
+from starlette.responses import JSONResponse, PlainTextResponse, HTMLResponse, FileResponse, RedirectResponse, Response
+from starlette.routing import Route, Mount, Router, Match
 from starlette.staticfiles import StaticFiles
 from starlette.applications import Starlette
 from starlette.middleware.cors import CORSMiddleware
+import gzip
+import hashlib
 import os
 
+# Widget assets are small and change only on deploy: keep them in memory,
+# precompressed, with a content hash as ETag so repeat loads revalidate to an
+# empty 304
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+
+# Scratch space for the HTTP endpoint's one-off PDFs; on tmpfs when there is
+# one, so they never reach persistent storage
+SCRATCH_DIR = tempfile.mkdtemp(prefix="unredactor_", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+WIDGET_CACHE_CONTROL = "public, max-age=86400"
+_widget_assets: dict[str, tuple[float, dict[str, bytes], str]] = {}
+
 async def health_check(request):
     """Simple health check endpoint for Railway."""
     return JSONResponse({"status": "healthy", "service": "unredactor-mcp"})
@@ -893,25 +1632,125 @@ async def terms_of_service(request):
 </html>"""
     return HTMLResponse(html)
 
+class ZeroCopyFileResponse(FileResponse):
+    """
+    FileResponse that hands the open file to the server when it supports the
+    ASGI zero-copy send extension, so the kernel sends it straight from the
+    page cache. Other servers, HEAD and Range requests get the regular
+    FileResponse.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or "http.response.zerocopysend" not in scope.get("extensions", {})
+            or scope["method"] == "HEAD"
+            or b"range" in (name for name, _ in scope["headers"])
+        ):
+            await super().__call__(scope, receive, send)
+            return
+
+        # The extension takes the file object itself, not a bare descriptor
+        with open(self.path, "rb") as f:
+            self.set_stat_headers(os.fstat(f.fileno()))
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.zerocopysend", "file": f, "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson when it is installed. The tool
+    responses carry whole PDFs as base64 strings, which the stdlib encoder
+    scans in pure Python.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def _load_widget_asset(name: str) -> tuple[dict[str, bytes], str] | None:
+    """
+    Return a widget asset's encoded variants and ETag.
+
+    Variants are keyed by content coding ("identity", "gzip" and, when
+    brotli is installed, "br"). The file is reread only when its mtime changes.
+    """
+    path = os.path.join(STATIC_DIR, name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _widget_assets.get(name)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            content = f.read()
+        variants = {"identity": content, "gzip": gzip.compress(content, 9)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(content)
+        etag = '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+        cached = _widget_assets[name] = (mtime, variants, etag)
+
+    return cached[1], cached[2]
+
+def _accepted_encodings(request) -> set[str]:
+    """Content codings the client accepts (ignoring any it refuses with q=0)."""
+    accepted = set()
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.partition(";")
+        quality = params.replace(" ", "").removeprefix("q=")
+        if quality and quality.strip("0.") == "":
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+def _widget_response(request, name: str, media_type: str) -> Response | None:
+    """Build the response for a widget asset, or None if it doesn't exist."""
+    asset = _load_widget_asset(name)
+    if asset is None:
+        return None
+
+    variants, etag = asset
+    accepted = _accepted_encodings(request)
+    encoding = next((coding for coding in ("br", "gzip") if coding in variants and coding in accepted), "identity")
+
+    # Each encoding is its own representation and needs its own strong ETag
+    if encoding != "identity":
+        etag = f'{etag[:-1]}-{encoding}"'
+    headers = {"ETag": etag, "Cache-Control": WIDGET_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(variants[encoding], media_type=media_type, headers=headers)
+
 async def serve_widget_html(request):
     """Serve the widget HTML file."""
-    widget_path = os.path.join(os.path.dirname(__file__), "static/widget.html")
-    if os.path.exists(widget_path):
-        return FileResponse(widget_path, media_type="text/html")
+    response = _widget_response(request, "widget.html", "text/html")
+    if response is not None:
+        return response
     return HTMLResponse("<html><body><h1>Widget not found</h1></body></html>", status_code=404)
 
 async def serve_widget_js(request):
     """Serve the widget JavaScript bundle."""
-    widget_path = os.path.join(os.path.dirname(__file__), "static/widget.js")
-    if os.path.exists(widget_path):
-        return FileResponse(widget_path, media_type="application/javascript")
+    response = _widget_response(request, "widget.js", "application/javascript")
+    if response is not None:
+        return response
     return PlainTextResponse("// Widget JS not found", status_code=404)
 
 async def serve_widget_css(request):
     """Serve the widget CSS file."""
-    widget_path = os.path.join(os.path.dirname(__file__), "static/widget.css")
-    if os.path.exists(widget_path):
-        return FileResponse(widget_path, media_type="text/css")
+    response = _widget_response(request, "widget.css", "text/css")
+    if response is not None:
+        return response
     return PlainTextResponse("/* Widget CSS not found */", status_code=404)
 
 async def serve_root(request):
@@ -922,9 +1761,69 @@ async def serve_demo_pdf(request):
     """Serve the demo PDF file."""
     demo_pdf_path = os.path.join(os.path.dirname(__file__), "../epstein-documents/TEST_REDACTED.pdf")
     if os.path.exists(demo_pdf_path):
-        return FileResponse(demo_pdf_path, media_type="application/pdf", filename="demo.pdf")
+        return ZeroCopyFileResponse(demo_pdf_path, media_type="application/pdf", filename="demo.pdf")
     return JSONResponse({'error': 'Demo PDF not found'}, status_code=404)
 
+async def download_file(request):
+    """Stream an uploaded or processed PDF as-is, without base64."""
+    file_id = request.path_params["file_id"]
+    if file_id not in uploaded_files:
+        return JSONResponse({'error': f"File ID '{file_id}' not found."}, status_code=404)
+    return ZeroCopyFileResponse(uploaded_files[file_id], media_type="application/pdf", filename=f"{file_id}.pdf")
+
+def _http_detect_black_boxes(args: dict) -> dict:
+    """detect_black_boxes for call_tool_http, on inline base64 PDF data."""
+    # Decode base64 PDF data and open it straight from memory
+    pdf_data = base64.b64decode(args.get('pdf_data'))
+    doc = fitz.open(stream=pdf_data, filetype="pdf")
+
+    try:
+        boxes = find_boxes_in_pdf(None, args.get('page_number', 0), doc=doc)
+        return {'boxes': boxes, 'page_number': args.get('page_number', 0)}
+    finally:
+        doc.close()
+
+def _http_replace_redaction_boxes(args: dict) -> dict:
+    """replace_redaction_boxes for call_tool_http, on inline base64 PDF data."""
+    # Decode base64 PDF data straight into a scratch file; page workers
+    # and the output save need real paths
+    scratch_id = secrets.token_hex(8)
+    tmp_path = os.path.join(SCRATCH_DIR, f"{scratch_id}.pdf")
+    output_path = os.path.join(SCRATCH_DIR, f"{scratch_id}_modified.pdf")
+
+    try:
+        with open(tmp_path, 'wb') as f:
+            _b64decode_to_file(args.get('pdf_data'), f)
+
+        replacement_result = replace_boxes_in_pdf(
+            pdf_path=tmp_path,
+            output_path=output_path,
+            target_width=args.get('box_width'),
+            target_height=args.get('box_height'),
+            replacement_text=args.get('replacement_text'),
+            page_num=args.get('page_number', 0),
+            tolerance=args.get('size_tolerance', 2.0)
+        )
+
+        # Read output file and encode as base64
+        output_data = _b64encode_file(output_path)
+
+        # Also return the original PDF for side-by-side comparison
+        return {
+            'processed_pdf': output_data,
+            'original_pdf': args.get('pdf_data'),  # Pass through the original
+            'total_boxes_replaced': replacement_result.get('total_boxes_replaced', 0),
+            'discovered_text': replacement_result.get('discovered_text', []),
+            'pages_modified': replacement_result.get('pages_modified', []),
+            'unredacted_count': replacement_result.get('unredacted_count', 0)
+        }
+    finally:
+        _close_cached(tmp_path)
+        _forget_detections(tmp_path)
+        for path in (tmp_path, output_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
 async def call_tool_http(request):
     """HTTP endpoint for standalone widget testing - wraps MCP tool calls."""
     try:
@@ -934,70 +1833,50 @@ async def call_tool_http(request):
 
         # Call the appropriate tool function
         if tool_name == 'detect_black_boxes':
-            # Decode base64 PDF data and save to temp file
-            import base64
-            import tempfile
-            pdf_data = base64.b64decode(args.get('pdf_data'))
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                tmp.write(pdf_data)
-                tmp_path = tmp.name
-
-            try:
-                boxes = find_boxes_in_pdf(tmp_path, args.get('page_number', 0))
-                result = {'boxes': boxes, 'page_number': args.get('page_number', 0)}
-            finally:
-                os.unlink(tmp_path)
-
+            handler = _http_detect_black_boxes
         elif tool_name == 'replace_redaction_boxes':
-            # Decode base64 PDF data and save to temp file
-            import base64
-            import tempfile
-            pdf_data = base64.b64decode(args.get('pdf_data'))
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                tmp.write(pdf_data)
-                tmp_path = tmp.name
-
-            output_tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-            output_path = output_tmp.name
-            output_tmp.close()
-
-            try:
-                replacement_result = replace_boxes_in_pdf(
-                    pdf_path=tmp_path,
-                    output_path=output_path,
-                    target_width=args.get('box_width'),
-                    target_height=args.get('box_height'),
-                    replacement_text=args.get('replacement_text'),
-                    page_num=args.get('page_number', 0),
-                    tolerance=args.get('size_tolerance', 2.0)
-                )
-
-                # Read output file and encode as base64
-                with open(output_path, 'rb') as f:
-                    output_data = base64.b64encode(f.read()).decode()
-
-                # Also return the original PDF for side-by-side comparison
-                result = {
-                    'processed_pdf': output_data,
-                    'original_pdf': args.get('pdf_data'),  # Pass through the original
-                    'total_boxes_replaced': replacement_result.get('total_boxes_replaced', 0),
-                    'discovered_text': replacement_result.get('discovered_text', []),
-                    'pages_modified': replacement_result.get('pages_modified', []),
-                    'unredacted_count': replacement_result.get('unredacted_count', 0)
-                }
-            finally:
-                os.unlink(tmp_path)
-                if os.path.exists(output_path):
-                    os.unlink(output_path)
+            handler = _http_replace_redaction_boxes
         else:
-            return JSONResponse({'error': f'Unknown tool: {tool_name}'}, status_code=400)
+            return FastJSONResponse({'error': f'Unknown tool: {tool_name}'}, status_code=400)
+
+        # Decoding, rendering and OCR are blocking; run them on a worker
+        # thread so the event loop keeps serving other connections
+        result = await asyncio.to_thread(handler, args)
 
-        return JSONResponse(result)
+        return FastJSONResponse(result)
     except Exception as e:
         print(f"Tool call error: {e}")
         import traceback
         traceback.print_exc()
-        return JSONResponse({'error': str(e)}, status_code=500)
+        return FastJSONResponse({'error': str(e)}, status_code=500)
+
+
+class ExactRouter(Router):
+    """
+    Router that dispatches parameterless routes with one dict lookup on the
+    request path. Anything else (path parameters, the MCP mount, lifespan,
+    method mismatches) falls through to the regular linear route scan.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._exact = {
+            route.path: route for route in self.routes
+            if isinstance(route, Route) and not route.param_convertors
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            route = self._exact.get(scope["path"])
+            if route is not None:
+                match, child_scope = route.matches(scope)
+                if match == Match.FULL:
+                    scope.setdefault("router", self)
+                    scope.update(child_scope)
+                    await route.handle(scope, receive, send)
+                    return
+        await super().__call__(scope, receive, send)
+
 
 # Create the base MCP app (it has /mcp route internally)
 mcp_app = mcp.http_app()
@@ -1010,6 +1889,7 @@ routes = [
     Route("/health", health_check),
     Route("/api/call-tool", call_tool_http, methods=["POST"]),  # Standalone widget endpoint
     Route("/api/demo-pdf", serve_demo_pdf),  # Demo PDF endpoint
+    Route("/api/download/{file_id}", download_file),  # Raw PDF download
     Route("/.well-known/openai-apps-challenge", well_known_challenge),
     Route("/privacy", privacy_policy),
     Route("/terms", terms_of_service),
@@ -1019,7 +1899,9 @@ routes = [
 ]
 
 # Create main app with MCP's lifespan and mount MCP app at root so /mcp is accessible
-app = Starlette(routes=routes, lifespan=mcp_app.lifespan)
+# Exact paths skip the route scan; everything else still reaches the mount
+app = Starlette(lifespan=mcp_app.lifespan)
+app.router = ExactRouter(routes=routes, lifespan=mcp_app.lifespan)
 app.mount("/", mcp_app)
 
 # Add CORS middleware for local testing with MCP Inspector